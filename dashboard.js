@@ -1,6 +1,9 @@
 document.addEventListener("DOMContentLoaded", () => {
   const DEFAULT_API_BASE_URL = 'https://vantage-backend-api.onrender.com/api';
   const API_BASE_URL = (window.APP_CONFIG && window.APP_CONFIG.backendApiBase) || DEFAULT_API_BASE_URL;
+  // Polling budget for tools that answer 202 while measuring (about two minutes).
+  const POLL_INTERVAL_MS = 3000;
+  const MAX_POLLS = 40;
 
   // --- Authentication Check ---
   const checkAuth = async () => {
@@ -350,13 +353,27 @@ document.addEventListener("DOMContentLoaded", () => {
     const tool = form.id.replace('-form', '');
     const endpoint = tool.replace('-', '_'); // e.g., port-scan -> port_scan
 
+    const submitRequest = () => fetch(`${API_BASE_URL}/${endpoint}`, {
+      method: "POST",
+      credentials: "include",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(data),
+    });
+
     try {
-      const response = await fetch(`${API_BASE_URL}/${endpoint}`, {
-        method: "POST",
-        credentials: "include",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(data),
-      });
+      let response = await submitRequest();
+      // Long-running tools (e.g. the speed test) answer 202 while they measure; poll
+      // with GET, giving up after MAX_POLLS attempts.
+      let polls = 0;
+      while (response.status === 202 && polls < MAX_POLLS) {
+        await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+        response = await fetch(`${API_BASE_URL}/${endpoint}`, { credentials: "include" });
+        polls += 1;
+      }
+      if (response.status === 202) {
+        displayError("The measurement is taking longer than expected. Please try again shortly.");
+        return;
+      }
       const result = await response.json();
       if (response.ok) {
         displayResults(result, resultsContainer, tool);
@@ -3,24 +3,57 @@ Application factory for the Vantage Flask application.
 
 This module contains the `create_app` factory function which is responsible for
 initializing the Flask application, loading the configuration, setting up
-extensions (like SQLAlchemy, Bcrypt, CORS), and registering all the
+extensions (like SQLAlchemy, Flask-Limiter, CORS), and registering all the
 blueprints for the different parts of the API.
 """
 
 import os
+import time
+import functools
+import queue
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
-from flask import Flask
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from flask import Flask, g, request
 from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_cors import CORS
 
 from .config import Config
-from .extensions import db, bcrypt, limiter
+from .extensions import db, limiter, OrjsonProvider
 from .routes.auth import auth_bp
 from .routes.main import main_bp
 from .routes.feedback import feedback_bp
 from .services.assistant_service import DashboardAssistant
 
+_log_queue_handler = None
+
+@functools.lru_cache(maxsize=None)
+def _ensure_dir(path):
+    """Creates `path` if needed, once per process for each distinct path."""
+    os.makedirs(path, exist_ok=True)
+
+def _file_log_handler():
+    """
+    Returns the process-wide handler that feeds logs/vantage.log.
+
+    The RotatingFileHandler is created once and written from a QueueListener
+    thread, so request threads only enqueue records and repeated create_app
+    calls (tests, preloading servers) don't open more log files.
+    """
+    global _log_queue_handler
+    if _log_queue_handler is None:
+        _ensure_dir('logs')
+        file_handler = RotatingFileHandler('logs/vantage.log', maxBytes=10240, backupCount=10)
+        file_handler.setFormatter(logging.Formatter(
+            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
+        file_handler.setLevel(logging.INFO)
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        _log_queue_handler = QueueHandler(log_queue)
+    return _log_queue_handler
+
 def create_app(config_class=Config):
     """
     Creates and configures an instance of the Flask application.
@@ -33,16 +66,17 @@ def create_app(config_class=Config):
         The configured Flask application instance.
     """
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     
     # --- Logging Configuration ---
-    if not os.path.exists('logs'):
-        os.mkdir('logs')
-    file_handler = RotatingFileHandler('logs/vantage.log', maxBytes=10240, backupCount=10)
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.setLevel(logging.INFO)
+    # Service modules log through the standard `logging` hierarchy; configure the
+    # root logger once so their records reach stderr alongside the app logger.
+    log_level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    logging.basicConfig(level=log_level, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    file_handler = _file_log_handler()
+    if file_handler not in app.logger.handlers:
+        app.logger.addHandler(file_handler)
+    app.logger.setLevel(log_level)
     app.logger.info('Vantage application startup')
 
     # Load configuration from the specified config object
@@ -50,19 +84,34 @@ def create_app(config_class=Config):
 
     # Ensure the instance folder exists for SQLite defaults
     instance_path = os.path.join(os.path.dirname(app.root_path), 'instance')
-    os.makedirs(instance_path, exist_ok=True)
+    _ensure_dir(instance_path)
 
     # --- Initialize extensions with the app ---
     db.init_app(app)
-    bcrypt.init_app(app)
     limiter.init_app(app)
     
     # Configure CORS using settings from the config object
-    CORS(app, resources={r"/api/*": {"origins": app.config['CORS_ORIGINS']}}, supports_credentials=True)
+    CORS(app, resources={r"/api/*": {"origins": app.config['CORS_ORIGINS_RE']}}, supports_credentials=True)
 
     # Apply ProxyFix middleware to correctly handle headers from a proxy
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
+    # --- Request timing (emitted at DEBUG level) ---
+    @app.before_request
+    def _start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _log_request_timing(response):
+        started = g.get("request_started")
+        if started is not None:
+            app.logger.debug(
+                "%s %s -> %s in %.1fms",
+                request.method, request.path, response.status_code,
+                (time.perf_counter() - started) * 1000,
+            )
+        return response
+
     # --- Register blueprints ---
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
@@ -72,7 +121,7 @@ def create_app(config_class=Config):
     try:
         assistant = DashboardAssistant()
         if assistant.gemini_api_key:
-            app.logger.info(f"Assistant Gemini configured (model={assistant.gemini_model})")
+            app.logger.info("Assistant Gemini configured (model=%s)", assistant.gemini_model)
         else:
             app.logger.info("Assistant Gemini not configured; using heuristic responses.")
     except Exception:
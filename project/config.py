@@ -8,6 +8,8 @@ development, production).
 """
 
 import os
+import re
+import redis
 from dotenv import load_dotenv
 
 # Load environment variables from a .env file
@@ -42,7 +44,49 @@ class Config:
     SQLALCHEMY_DATABASE_URI = DATABASE_URL
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # query_cache_size bounds SQLAlchemy's compiled-SQL cache (default 500); the
+    # headroom keeps every route's statements cached instead of recompiled.
+    SQLALCHEMY_ENGINE_OPTIONS = {'query_cache_size': 1200}
+
+    # Connection pool per worker process. pre_ping swaps out connections the
+    # server dropped while idle, and recycle stays under managed-Postgres idle
+    # limits. LIFO checkout keeps reusing the most recently returned connections
+    # so surplus ones sit idle long enough to be recycled after a burst.
+    # Size the pool so workers x (size + overflow) fits the server.
+    # SQLite has no server connections to manage, so it keeps SQLAlchemy's
+    # default pool (the StaticPool used for in-memory databases rejects sizing).
+    if not SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        SQLALCHEMY_ENGINE_OPTIONS |= {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', '20')),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '40')),
+            'pool_pre_ping': True,
+            'pool_recycle': 1800,
+            'pool_use_lifo': True,
+        }
+
 
+    # Rate limiting (read by Flask-Limiter). Set REDIS_URL in production so every
+    # gunicorn worker shares one set of counters; the moving window avoids the
+    # burst-at-the-boundary problem of fixed windows.
+    # RATELIMIT_STORAGE_URI names any `limits` backend explicitly; otherwise
+    # REDIS_URL is used.
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI') or os.environ.get('REDIS_URL', 'memory://')
+    RATELIMIT_STRATEGY = 'moving-window'
+    # Fail fast if Redis is unreachable and keep limiting with per-worker
+    # in-memory counters until it is back, instead of erroring requests.
+    RATELIMIT_STORAGE_OPTIONS = {'socket_connect_timeout': 1, 'socket_timeout': 1}
+    RATELIMIT_IN_MEMORY_FALLBACK_ENABLED = True
+    if RATELIMIT_STORAGE_URI.startswith(('redis://', 'rediss://')):
+        # One bounded pool per worker. With gevent an unbounded pool would open a
+        # connection per in-flight request; here callers wait up to 1s for one.
+        # (limits already caches its Lua scripts' SHAs and calls EVALSHA.)
+        RATELIMIT_STORAGE_OPTIONS['connection_pool'] = redis.BlockingConnectionPool.from_url(
+            RATELIMIT_STORAGE_URI,
+            max_connections=int(os.environ.get('REDIS_MAX_CONNECTIONS', '32')),
+            timeout=1,
+            **RATELIMIT_STORAGE_OPTIONS,
+        )
+
     # CORS settings
     CORS_ORIGINS = [
         "https://asoraledecnal.github.io",
@@ -50,6 +94,9 @@ class Config:
         "http://127.0.0.1:8080",
         "http://127.0.0.1:5500"
     ]
+    # Single anchored pattern for Flask-CORS, so an Origin is checked with one
+    # compiled match instead of a comparison per listed origin.
+    CORS_ORIGINS_RE = re.compile('(?:' + '|'.join(map(re.escape, CORS_ORIGINS)) + r')\Z', re.IGNORECASE)
     
     # Email settings for feedback
     SENDGRID_API_KEY = os.environ.get('SENDGRID_API_KEY')
@@ -1,19 +1,76 @@
 """
 Centralized extension management for the Flask application.
 
-This module initializes all Flask extensions (e.g., SQLAlchemy, Bcrypt)
+This module initializes all Flask extensions (e.g., SQLAlchemy, Flask-Limiter)
 to prevent circular import errors when they are needed in different parts
 of the application, such as blueprints or models.
 """
 
+import os
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+from flask import g, session
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
-db = SQLAlchemy()
-bcrypt = Bcrypt()
+
+def client_key():
+    """
+    Rate-limit key for the current request: the logged-in user (or "anon")
+    paired with the client IP. Resolved once per request and reused from `g`.
+    """
+    key = g.get("_client_key")
+    if key is None:
+        user_id = session.get("user_id")
+        if isinstance(user_id, bytes):
+            user_id = user_id.hex()
+        key = f"{user_id or 'anon'}:{get_remote_address()}"
+        g._client_key = key
+    return key
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson, which encodes datetimes and UUIDs natively.
+
+    Types orjson doesn't know are handed to Flask's default serializer, and any
+    stdlib-only keyword arguments fall back to the stdlib implementation.
+    """
+
+    def dumps(self, obj, **kwargs):
+        indent = kwargs.pop("indent", None)
+        sort_keys = kwargs.pop("sort_keys", self.sort_keys)
+        kwargs.pop("separators", None)
+        if kwargs:
+            return super().dumps(obj, indent=indent, sort_keys=sort_keys, **kwargs)
+
+        option = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+# Outbound email (OTP and password-reset messages) is sent on a small reused
+# pool so request threads never wait on SendGrid and bursts don't spawn a
+# thread per message. MAIL_POOL_SIZE caps concurrent SendGrid requests.
+email_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("MAIL_POOL_SIZE", "8")), thread_name_prefix="mail")
+atexit.register(email_executor.shutdown, wait=False)
+
+# Routes commit explicitly and mostly read, so don't flush before every query,
+# and keep committed objects loaded instead of re-selecting them on next access.
+db = SQLAlchemy(session_options={"autoflush": False, "expire_on_commit": False})
 limiter = Limiter(
-    key_func=get_remote_address,
+    key_func=client_key,
     default_limits=["200 per day", "50 per hour"]
 )
@@ -7,11 +7,38 @@ structure of the database and the relationships between different data
 entities.
 """
 
-import uuid
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy import DateTime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 from .extensions import db
 
+class _random_uuid(FunctionElement):
+    """A new random UUID, generated by the database in the INSERT itself."""
+    type = UUID(as_uuid=True)
+    inherit_cache = True
+
+@compiles(_random_uuid, 'postgresql')
+def _random_uuid_postgresql(element, compiler, **kw):
+    # Built in since PostgreSQL 13, provided by pgcrypto before that.
+    return "gen_random_uuid()"
+
+@compiles(_random_uuid)
+def _random_uuid_default(element, compiler, **kw):
+    # SQLite (local development) has no UUID function; 16 random bytes in hex
+    # are the form its UUID columns store.
+    return "lower(hex(randomblob(16)))"
+
+def _uuid_primary_key():
+    """
+    Builds a UUID primary key column.
+
+    The key is a SQL default rather than a Python one, so no UUID is made in
+    Python on insert, and being part of the statement it does not depend on
+    the table having a DEFAULT of its own.
+    """
+    return db.Column(UUID(as_uuid=True), primary_key=True, default=_random_uuid())
+
 class User(db.Model):
     """
     Represents a user in the system.
@@ -25,7 +52,7 @@ class User(db.Model):
         otp_expiry (datetime): The expiration time for the current OTP.
     """
     __tablename__ = 'users'
-    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = _uuid_primary_key()
     username = db.Column(db.Text, unique=True, nullable=False)
     firstname = db.Column(db.Text, nullable=True)
     lastname = db.Column(db.Text, nullable=True)
@@ -36,6 +63,14 @@ class User(db.Model):
     otp_hash = db.Column(db.Text, nullable=True)
     otp_expiry = db.Column(DateTime, nullable=True)
 
+    # Logins and duplicate checks compare lower(email); index that expression so
+    # they stay a single index probe and case variants can't register twice.
+    # Logins by username compare lower(username), so that gets an index too.
+    __table_args__ = (
+        db.Index("ix_users_email_lower", db.func.lower(email), unique=True),
+        db.Index("ix_users_username_lower", db.func.lower(username)),
+    )
+
     def __repr__(self):
         return f"<User {self.username}>"
 
@@ -52,7 +87,7 @@ class Feedback(db.Model):
         created_at (datetime): The timestamp when the feedback was created.
     """
     __tablename__ = 'feedback'
-    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = _uuid_primary_key()
     name = db.Column(db.Text, nullable=False)
     email = db.Column(db.Text, nullable=False)
     subject = db.Column(db.Text)
@@ -5,17 +5,89 @@ This blueprint handles user registration, session management (login/logout),
 and session verification. All routes are prefixed with '/api'.
 """
 
-import threading
 from datetime import datetime, timedelta, timezone
 from flask import Blueprint, request, jsonify, session, current_app
-from sqlalchemy import func
-import uuid
+from sqlalchemy import bindparam, case, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
 from ..models import User
-from ..extensions import db, bcrypt
-from ..services import otp_service, email_service
+from ..extensions import db, limiter, client_key, email_executor
+from ..services import otp_service, email_service, password_service
+from ..utils import MAX_FIELD_LENGTH, get_session_user, missing_fields, too_long_fields
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api')
 
+# Legacy bcrypt hashes only cover the first 72 bytes of a password (and bcrypt>=5
+# raises on anything longer), so the limit is kept for every account; it also
+# stops oversized input from reaching the hasher.
+MAX_PASSWORD_BYTES = 72
+PASSWORD_TOO_LONG_MESSAGE = f"Password must be at most {MAX_PASSWORD_BYTES} bytes."
+
+# User lookups are built once with bound parameters, so requests skip rebuilding
+# the statements and SQLAlchemy's compiled cache reuses their SQL. Each loads
+# only the columns its view reads.
+_SIGNUP_MATCHES = (
+    select(User)
+    .options(load_only(User.id, User.email, User.is_verified))
+    .where(or_(func.lower(User.email) == bindparam("email"), User.username == bindparam("username")))
+)
+# Login accepts an email or a username in one query; if the identifier is one
+# account's email and another's username, the email match wins.
+_LOGIN_BY_IDENTIFIER = (
+    select(User)
+    .options(load_only(User.id, User.email, User.password_hash, User.is_verified))
+    .where(or_(func.lower(User.email) == bindparam("identifier"), func.lower(User.username) == bindparam("identifier")))
+    .order_by(case((func.lower(User.email) == bindparam("identifier"), 0), else_=1))
+    .limit(1)
+)
+_OTP_CHECK_BY_EMAIL = (
+    select(User)
+    .options(load_only(User.id, User.is_verified, User.otp_hash, User.otp_expiry))
+    .where(func.lower(User.email) == bindparam("email"))
+)
+_VERIFICATION_BY_EMAIL = (
+    select(User)
+    .options(load_only(User.id, User.email, User.is_verified))
+    .where(func.lower(User.email) == bindparam("email"))
+)
+_RESET_TARGET_BY_EMAIL = select(User).options(load_only(User.id, User.email)).where(func.lower(User.email) == bindparam("email"))
+
+
+def _password_too_long(password: str) -> bool:
+    """
+    True if `password` exceeds the 72-byte password limit. Character length is checked
+    first so oversized input is rejected without encoding it.
+    """
+    return len(password) > MAX_PASSWORD_BYTES or len(password.encode("utf-8")) > MAX_PASSWORD_BYTES
+
+
+@auth_bp.errorhandler(password_service.HasherBusy)
+def _password_hasher_busy(_error):
+    current_app.logger.warning("Password hashing pool saturated; rejecting request.")
+    return jsonify({"message": "Server is busy. Please try again shortly."}), 503, {"Retry-After": "1"}
+
+
+def _lookup_email(value):
+    """
+    Normalizes a submitted email for the case-insensitive lookups above, or
+    returns None if it isn't a non-blank string.
+    """
+    if not isinstance(value, str):
+        return None
+    return value.strip().lower() or None
+
+
+def _rotate_otp(user, send_email):
+    """
+    Issues `user` a fresh five-minute OTP, commits it, and queues `send_email`
+    to deliver it on the mail executor.
+    """
+    otp = otp_service.generate_otp()
+    user.otp_hash = otp_service.hash_otp(otp)
+    user.otp_expiry = datetime.now(timezone.utc) + timedelta(minutes=5)
+    db.session.commit()
+    email_executor.submit(send_email, user.email, otp)
+
 
 def _to_utc(dt):
     """
@@ -27,7 +99,22 @@ def _to_utc(dt):
         return dt.replace(tzinfo=timezone.utc)
     return dt.astimezone(timezone.utc)
 
+
+def _credential_key():
+    """
+    Rate-limit key pairing the submitted credential with the client IP, so
+    repeated attempts on one account are throttled without locking out other
+    users behind the same IP. The per-client default limits still apply on top
+    (`override_defaults=False`), so one address can't spread attempts across
+    many accounts.
+    """
+    data = request.get_json(silent=True)
+    credential = (data.get("login_identifier") or data.get("email")) if isinstance(data, dict) else None
+    credential = credential.strip().lower() if isinstance(credential, str) else ""
+    return f"{credential}:{client_key()}"
+
 @auth_bp.route('/signup', methods=['POST'])
+@limiter.limit("5 per minute", key_func=_credential_key, override_defaults=False)
 def signup():
     """
     Handles new user registration and sends an OTP for email verification.
@@ -35,48 +122,49 @@ def signup():
     try:
         session.clear()
         data = request.get_json(silent=True) or {}
-        email = (data.get("email") or "").strip()
-        firstname = (data.get("firstname") or "").strip()
-        lastname = (data.get("lastname") or "").strip()
-        username = (data.get("username") or "").strip()
-        phone = (data.get("phone") or "").strip() or None
-
-        required_fields = {
-            "email": email,
-            "password": (data.get("password") or "").strip(),
-            "firstname": firstname,
-            "lastname": lastname,
-            "username": username,
-        }
-        missing = [field for field, value in required_fields.items() if not value]
+        missing = missing_fields(data, ("email", "password", "firstname", "lastname", "username"))
         if missing:
             return jsonify({"message": f"Missing required fields: {', '.join(missing)}."}), 400
 
-        existing_user = User.query.filter_by(email=email).first()
+        email = data["email"].strip()
+        password = data["password"].strip()
+        if _password_too_long(password):
+            return jsonify({"message": PASSWORD_TOO_LONG_MESSAGE}), 400
+        too_long = too_long_fields(data, ("email", "firstname", "lastname", "username"))
+        if too_long:
+            return jsonify({
+                "message": f"Fields must be at most {MAX_FIELD_LENGTH} characters: {', '.join(too_long)}."
+            }), 400
+        firstname = data["firstname"].strip()
+        lastname = data["lastname"].strip()
+        username = data["username"].strip()
+        phone = data.get("phone")
+        phone = (phone.strip() or None) if isinstance(phone, str) else None
+
+        # One round trip for both uniqueness checks; the email match decides the
+        # response first, as an unverified account gets a fresh OTP instead.
+        matches = db.session.scalars(_SIGNUP_MATCHES, {"email": email.lower(), "username": username}).all()
+        existing_user = next((u for u in matches if u.email.lower() == email.lower()), None)
         if existing_user:
             if not existing_user.is_verified:
-                otp = otp_service.generate_otp()
-                existing_user.otp_hash = otp_service.hash_otp(otp)
-                existing_user.otp_expiry = datetime.now(timezone.utc) + timedelta(minutes=5)
-                db.session.commit()
-                current_app.logger.info(f"Resent OTP to unverified user: {email}")
-                threading.Thread(target=email_service.send_otp_email, args=(existing_user.email, otp)).start()
+                _rotate_otp(existing_user, email_service.send_otp_email)
+                current_app.logger.info("Resent OTP to unverified user: %s", email)
                 return jsonify({
                     "message": "Account already created but not verified. A new OTP has been sent. Redirecting to verification.",
                     "email": existing_user.email,
                     "action": "verify"
                 }), 200
-            current_app.logger.warning(f"Signup attempt for existing email: {email}")
+            current_app.logger.warning("Signup attempt for existing email: %s", email)
             return jsonify({
                 "message": "An account with this email is already registered and verified. Redirecting to login.",
                 "action": "login"
             }), 409
 
-        if User.query.filter_by(username=username).first():
-            current_app.logger.warning(f"Signup attempt for existing username: {username}")
+        if matches:
+            current_app.logger.warning("Signup attempt for existing username: %s", username)
             return jsonify({"message": "Username is taken. Please choose another."}), 409
 
-        hashed_password = bcrypt.generate_password_hash(required_fields["password"]).decode("utf-8")
+        hashed_password = password_service.hash_password(password)
         
         otp = otp_service.generate_otp()
         otp_hash = otp_service.hash_otp(otp)
@@ -94,16 +182,25 @@ def signup():
             otp_expiry=otp_expiry
         )
         db.session.add(new_user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent signup claimed the email or username after the checks
+            # above; the unique indexes are the final arbiter.
+            db.session.rollback()
+            current_app.logger.warning("Signup lost a race for email/username: %s / %s", email, username)
+            return jsonify({"message": "An account with this email or username already exists."}), 409
 
-        current_app.logger.info(f"New user created: {email}. Sending OTP.")
-        threading.Thread(target=email_service.send_otp_email, args=(new_user.email, otp)).start()
+        current_app.logger.info("New user created: %s. Sending OTP.", email)
+        email_executor.submit(email_service.send_otp_email, new_user.email, otp)
 
         return jsonify({
             "message": "User created successfully! Please check your email for an OTP to verify your account."
         }), 201
+    except password_service.HasherBusy:
+        raise
     except Exception as e:
-        current_app.logger.error(f"An unexpected error occurred during signup: {e}", exc_info=True)
+        current_app.logger.error("An unexpected error occurred during signup: %s", e, exc_info=True)
         return jsonify({"message": "An internal server error occurred."}), 500
 
 
@@ -113,13 +210,13 @@ def verify_otp():
     Handles OTP verification for a user's account.
     """
     data = request.get_json(silent=True) or {}
-    email = data.get("email")
+    email = _lookup_email(data.get("email"))
     if not email or not data.get("otp"):
         return jsonify({"message": "Email and OTP are required."}), 400
 
-    user = User.query.filter_by(email=email).first()
+    user = db.session.scalars(_OTP_CHECK_BY_EMAIL, {"email": email}).first()
     if not user:
-        current_app.logger.warning(f"OTP verification attempt for non-existent user: {email}")
+        current_app.logger.warning("OTP verification attempt for non-existent user: %s", email)
         return jsonify({"message": "User not found."}), 404
     
     if user.is_verified:
@@ -127,11 +224,11 @@ def verify_otp():
 
     expiry = _to_utc(user.otp_expiry)
     if not expiry or expiry < datetime.now(timezone.utc):
-        current_app.logger.warning(f"Expired OTP attempt for user: {email}")
+        current_app.logger.warning("Expired OTP attempt for user: %s", email)
         return jsonify({"message": "OTP has expired."}), 400
 
     if not otp_service.verify_otp(data["otp"], user.otp_hash):
-        current_app.logger.warning(f"Invalid OTP attempt for user: {email}")
+        current_app.logger.warning("Invalid OTP attempt for user: %s", email)
         return jsonify({"message": "Invalid OTP."}), 400
 
     user.is_verified = True
@@ -142,8 +239,8 @@ def verify_otp():
     # Auto-log the user in after verification to avoid a dead-end redirect loop.
     session.pop("assistant_context", None)
     session.pop("assistant_history", None)
-    session["user_id"] = str(user.id)
-    current_app.logger.info(f"Account successfully verified for user: {email}; session started.")
+    session["user_id"] = user.id.bytes
+    current_app.logger.info("Account successfully verified for user: %s; session started.", email)
 
     return jsonify({"message": "Account verified successfully! Redirecting to your dashboard."}), 200
 
@@ -153,58 +250,67 @@ def resend_otp():
     """
     Resends a verification OTP for an unverified user.
     """
-    data = request.get_json() or {}
-    email = data.get("email")
+    data = request.get_json(silent=True) or {}
+    email = _lookup_email(data.get("email"))
     if not email:
         return jsonify({"message": "Email is required."}), 400
 
-    user = User.query.filter_by(email=email).first()
+    user = db.session.scalars(_VERIFICATION_BY_EMAIL, {"email": email}).first()
     if not user:
-        current_app.logger.info(f"OTP resend requested for non-existent user: {email}")
+        current_app.logger.info("OTP resend requested for non-existent user: %s", email)
         return jsonify({"message": "If an account exists, a new OTP has been sent."}), 200
 
     if user.is_verified:
         return jsonify({"message": "Account already verified. You can log in."}), 200
 
-    otp = otp_service.generate_otp()
-    user.otp_hash = otp_service.hash_otp(otp)
-    user.otp_expiry = datetime.now(timezone.utc) + timedelta(minutes=5)
-    db.session.commit()
-
-    current_app.logger.info(f"Resent verification OTP to user: {email}")
-    threading.Thread(target=email_service.send_otp_email, args=(user.email, otp)).start()
+    _rotate_otp(user, email_service.send_otp_email)
+    current_app.logger.info("Resent verification OTP to user: %s", email)
 
     return jsonify({"message": "A new OTP has been sent to your email."}), 200
 
 
 @auth_bp.route('/login', methods=['POST'])
+@limiter.limit("10 per minute", key_func=_credential_key, override_defaults=False)
 def login():
     """
     Authenticates a user and creates a session.
     """
     data = request.get_json(silent=True) or {}
-    identifier = (data.get("login_identifier") or data.get("email") or "").strip()
-    password = (data.get("password") or "").strip()
-    user = None
-    if identifier:
-        lowered = identifier.lower()
-        user = User.query.filter(func.lower(User.email) == lowered).first()
-        if not user:
-            user = User.query.filter(func.lower(User.username) == lowered).first()
-    if not identifier or not password:
+    # Reject incomplete bodies before opening a database session.
+    identifier_field = "login_identifier" if isinstance(data, dict) and data.get("login_identifier") else "email"
+    if missing_fields(data, (identifier_field, "password")):
         return jsonify({"message": "Email (or username) and password are required."}), 400
 
-    if not user or not bcrypt.check_password_hash(user.password_hash, password):
-        current_app.logger.warning(f"Failed login attempt for user: {identifier}")
+    if too_long_fields(data, (identifier_field,)):
+        return jsonify({"message": f"Email (or username) must be at most {MAX_FIELD_LENGTH} characters."}), 400
+
+    identifier = data[identifier_field].strip()
+    password = data["password"].strip()
+    if _password_too_long(password):
+        return jsonify({"message": PASSWORD_TOO_LONG_MESSAGE}), 400
+    lowered = identifier.lower()
+    user = db.session.scalars(_LOGIN_BY_IDENTIFIER, {"identifier": lowered}).first()
+
+    # Always run exactly one hash comparison so response timing doesn't reveal
+    # whether the identifier exists.
+    password_ok = password_service.verify_password(user.password_hash if user else None, password)
+    if not user or not password_ok:
+        current_app.logger.warning("Failed login attempt for user: %s", identifier)
         return jsonify({"message": "Invalid email or password"}), 401
 
+    # Upgrade bcrypt (or outdated Argon2) hashes while the plaintext is at hand.
+    # Under load the upgrade is skipped and retried on a later login.
+    if password_service.needs_rehash(user.password_hash):
+        try:
+            user.password_hash = password_service.hash_password(password)
+        except password_service.HasherBusy:
+            pass
+        else:
+            db.session.commit()
+
     if not user.is_verified:
-        otp = otp_service.generate_otp()
-        user.otp_hash = otp_service.hash_otp(otp)
-        user.otp_expiry = datetime.now(timezone.utc) + timedelta(minutes=5)
-        db.session.commit()
-        threading.Thread(target=email_service.send_otp_email, args=(user.email, otp)).start()
-        current_app.logger.warning(f"Login attempt by unverified user: {user.email}. OTP resent.")
+        _rotate_otp(user, email_service.send_otp_email)
+        current_app.logger.warning("Login attempt by unverified user: %s. OTP resent.", user.email)
         return jsonify({
             "message": "Account not verified. A new OTP has been sent to your email.",
             "email": user.email,
@@ -214,8 +320,8 @@ def login():
     # Clear any stale assistant context/history on new login.
     session.pop("assistant_context", None)
     session.pop("assistant_history", None)
-    session["user_id"] = str(user.id)
-    current_app.logger.info(f"User logged in successfully: {user.email}")
+    session["user_id"] = user.id.bytes
+    current_app.logger.info("User logged in successfully: %s", user.email)
     return jsonify({"message": "Login successful!", "user_id": user.id}), 200
 
 
@@ -226,18 +332,17 @@ def logout():
     """
     user_id = session.get('user_id')
     if user_id:
-        try:
-            user_uuid = uuid.UUID(user_id)
-            user = User.query.get(user_uuid)
-            if user:
-                current_app.logger.info(f"User logged out: {user.email}")
-        except (ValueError, TypeError):
-            current_app.logger.warning("Invalid user_id in session during logout")
+        user = get_session_user()
+        if user:
+            current_app.logger.info("User logged out: %s", user.email)
+        else:
+            current_app.logger.warning("Unknown or invalid user_id in session during logout")
     session.clear()
     return jsonify({"message": "Logged out successfully"}), 200
 
 
 @auth_bp.route('/check_session', methods=['GET'])
+@limiter.exempt
 def check_session():
     """
     Checks if a user is currently logged in.
@@ -250,22 +355,17 @@ def forgot_password():
     """
     Initiates the password reset process by sending an OTP to the user's email.
     """
-    data = request.get_json() or {}
-    email = data.get("email")
+    data = request.get_json(silent=True) or {}
+    email = _lookup_email(data.get("email"))
     if not email:
         return jsonify({"message": "Email is required."}), 400
 
-    user = User.query.filter_by(email=email).first()
+    user = db.session.scalars(_RESET_TARGET_BY_EMAIL, {"email": email}).first()
     if user:
-        otp = otp_service.generate_otp()
-        user.otp_hash = otp_service.hash_otp(otp)
-        user.otp_expiry = datetime.now(timezone.utc) + timedelta(minutes=5)
-        db.session.commit()
-
-        current_app.logger.info(f"Password reset OTP dispatched for user: {email}")
-        threading.Thread(target=email_service.send_password_reset_email, args=(user.email, otp)).start()
+        _rotate_otp(user, email_service.send_password_reset_email)
+        current_app.logger.info("Password reset OTP dispatched for user: %s", email)
     else:
-        current_app.logger.info(f"Password reset requested for non-existent user: {email}")
+        current_app.logger.info("Password reset requested for non-existent user: %s", email)
 
     # Always return a generic response to prevent account enumeration
     return jsonify({"message": "If an account with that email exists, a password reset OTP has been sent."}), 200
@@ -279,10 +379,6 @@ def change_email():
     user_id = session.get("user_id")
     if not user_id:
         return jsonify({"message": "Unauthorized"}), 401
-    try:
-        user_uuid = uuid.UUID(user_id)
-    except (ValueError, TypeError):
-        return jsonify({"message": "Invalid session"}), 401
 
     data = request.get_json(silent=True) or {}
     new_email = (data.get("new_email") or "").strip()
@@ -290,13 +386,15 @@ def change_email():
 
     if not new_email or not current_password:
         return jsonify({"message": "New email and current password are required."}), 400
+    if _password_too_long(current_password):
+        return jsonify({"message": PASSWORD_TOO_LONG_MESSAGE}), 400
 
-    user = User.query.get(user_uuid)
+    user = get_session_user()
     if not user:
         return jsonify({"message": "User not found."}), 404
 
     # Verify password
-    if not bcrypt.check_password_hash(user.password_hash, current_password):
+    if not password_service.verify_password(user.password_hash, current_password):
         current_app.logger.warning("Change email failed: bad password for user %s", user.email)
         return jsonify({"message": "Invalid credentials."}), 401
 
@@ -320,10 +418,6 @@ def change_password():
     user_id = session.get("user_id")
     if not user_id:
         return jsonify({"message": "Unauthorized"}), 401
-    try:
-        user_uuid = uuid.UUID(user_id)
-    except (ValueError, TypeError):
-        return jsonify({"message": "Invalid session"}), 401
 
     data = request.get_json(silent=True) or {}
     current_password = (data.get("current_password") or "").strip()
@@ -331,16 +425,18 @@ def change_password():
 
     if not current_password or not new_password:
         return jsonify({"message": "Current password and new password are required."}), 400
+    if _password_too_long(current_password) or _password_too_long(new_password):
+        return jsonify({"message": PASSWORD_TOO_LONG_MESSAGE}), 400
 
-    user = User.query.get(user_uuid)
+    user = get_session_user()
     if not user:
         return jsonify({"message": "User not found."}), 404
 
-    if not bcrypt.check_password_hash(user.password_hash, current_password):
+    if not password_service.verify_password(user.password_hash, current_password):
         current_app.logger.warning("Change password failed: bad password for user %s", user.email)
         return jsonify({"message": "Current password is incorrect."}), 401
 
-    user.password_hash = bcrypt.generate_password_hash(new_password).decode("utf-8")
+    user.password_hash = password_service.hash_password(new_password)
     # Clear any pending OTP data when password is changed directly
     user.otp_hash = None
     user.otp_expiry = None
@@ -354,34 +450,37 @@ def reset_password():
     Resets the user's password using a valid OTP.
     """
     data = request.get_json(silent=True) or {}
-    email = data.get("email")
-    required_fields = ["email", "otp", "new_password"]
-    if not all(field in data and data.get(field) for field in required_fields):
+    email = _lookup_email(data.get("email"))
+    required_fields = ["otp", "new_password"]
+    if (not email or not all(data.get(field) for field in required_fields)
+            or not isinstance(data["new_password"], str)):
         return jsonify({"message": "Email, OTP, and new password are required."}), 400
+    if _password_too_long(data["new_password"]):
+        return jsonify({"message": PASSWORD_TOO_LONG_MESSAGE}), 400
 
-    user = User.query.filter_by(email=email).first()
+    user = db.session.scalars(_OTP_CHECK_BY_EMAIL, {"email": email}).first()
     if not user:
-        current_app.logger.warning(f"Password reset attempt for non-existent user: {email}")
+        current_app.logger.warning("Password reset attempt for non-existent user: %s", email)
         return jsonify({"message": "Invalid email or OTP."}), 400
 
     if not user.is_verified:
-        current_app.logger.warning(f"Password reset attempt for unverified user: {email}")
+        current_app.logger.warning("Password reset attempt for unverified user: %s", email)
         return jsonify({"message": "Account not verified. Please verify your account first."}), 400
 
     expiry = _to_utc(user.otp_expiry)
     if not expiry or expiry < datetime.now(timezone.utc):
-        current_app.logger.warning(f"Expired password reset OTP for user: {email}")
+        current_app.logger.warning("Expired password reset OTP for user: %s", email)
         return jsonify({"message": "OTP has expired."}), 400
 
     if not user.otp_hash or not otp_service.verify_otp(data["otp"], user.otp_hash):
-        current_app.logger.warning(f"Invalid password reset OTP for user: {email}")
+        current_app.logger.warning("Invalid password reset OTP for user: %s", email)
         return jsonify({"message": "Invalid email or OTP."}), 400
 
-    user.password_hash = bcrypt.generate_password_hash(data["new_password"]).decode("utf-8")
+    user.password_hash = password_service.hash_password(data["new_password"])
     user.otp_hash = None
     user.otp_expiry = None
     db.session.commit()
-    current_app.logger.info(f"Password successfully reset for user: {email}")
+    current_app.logger.info("Password successfully reset for user: %s", email)
 
     # Invalidate any existing session after password reset for safety
     session.clear()
@@ -4,54 +4,67 @@ Feedback submission route for the Vantage API.
 This blueprint handles the contact form submission, saving the feedback to the
 database and triggering an asynchronous email notification.
 """
-import threading
 import re # Import re for regex validation
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from ..models import db, Feedback
 from ..services import email_service
+from ..utils import MAX_FIELD_LENGTH, missing_fields, too_long_fields
 
 feedback_bp = Blueprint('feedback', __name__, url_prefix='/api')
 
+# Basic email format check, compiled once and applied with fullmatch.
+_EMAIL_RE = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+
 @feedback_bp.route('/contact', methods=['POST'])
 def handle_contact():
     """
     Handles a new feedback submission.
 
-    Saves the feedback to the database and dispatches an email notification
-    in a background thread. Returns a 202 Accepted response immediately.
-    Includes basic email format validation.
+    Saves the feedback to the database and queues an email notification for
+    the background sender. Returns a 202 Accepted response immediately, or a
+    503 when the notification queue is saturated. Includes basic email format
+    validation.
     """
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
 
-    if not data or not data.get("name") or not data.get("email") or not data.get("message"):
+    fields = ("name", "email", "message")
+    if missing_fields(data, fields):
         return jsonify({"success": False, "error": "Name, email, and message are required."}), 400
+    too_long = too_long_fields(data, fields)
+    if too_long:
+        return jsonify({
+            "success": False,
+            "error": f"{', '.join(too_long).capitalize()} must be at most {MAX_FIELD_LENGTH} characters."
+        }), 400
 
     # Basic email format validation
-    email_regex = r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
-    if not re.match(email_regex, data["email"]):
+    if not _EMAIL_RE.fullmatch(data["email"]):
         return jsonify({"success": False, "error": "Invalid email address format."}), 400
 
+    # Shed load predictably before writing anything if the mailer is backed up.
+    if email_service.feedback_queue_full():
+        return jsonify({"success": False, "error": "Feedback service is busy. Please try again shortly."}), 503, {"Retry-After": "30"}
+
     try:
-        # Save feedback to the database first
-        new_feedback = Feedback(
-            name=data["name"],
-            email=data["email"],
-            subject=data.get("subject"),
-            message=data["message"]
+        # Save feedback to the database first. This endpoint only ever writes,
+        # so a Core INSERT skips the ORM unit-of-work bookkeeping.
+        db.session.execute(
+            Feedback.__table__.insert().values(
+                name=data["name"],
+                email=data["email"],
+                subject=data.get("subject"),
+                message=data["message"]
+            )
         )
-        db.session.add(new_feedback)
         db.session.commit()
 
-        # Start a background thread to send the email without blocking
-        thread = threading.Thread(
-            target=email_service.send_feedback_email,
-            args=(data["name"], data["email"], data.get("subject"), data["message"])
-        )
-        thread.start()
+        # Hand the email to the background sender without blocking
+        if not email_service.queue_feedback_email(data["name"], data["email"], data.get("subject"), data["message"]):
+            current_app.logger.warning("Feedback email queue full; notification dropped.")
 
         return jsonify({"success": True}), 202  # 202 Accepted
 
     except Exception as e:
         db.session.rollback()
-        print(f"Error in /api/contact: {e}")
+        current_app.logger.error("Error in /api/contact: %s", e, exc_info=True)
         return jsonify({"success": False, "error": "An internal error occurred."}), 500
@@ -7,18 +7,48 @@ WHOIS, DNS, geolocation, etc. All routes require user authentication.
 """
 from flask import Blueprint, request, jsonify, session
 from functools import wraps
-import uuid
-from ..utils import is_valid_host
+from concurrent.futures import ThreadPoolExecutor, wait
+from ..utils import get_session_user, is_valid_host, missing_fields
 from ..services import domain_service
 from ..services.assistant_service import DashboardAssistant
 from ..services.guidance_service import DiagnosticGuidanceService
 from ..models import User
-from ..extensions import db
+from ..extensions import db, limiter
+
+try:
+    from gevent import monkey as gevent_monkey
+except ImportError:
+    gevent_monkey = None
+import os
+import time
 import traceback
 from datetime import datetime, timezone
 
 main_bp = Blueprint('main', __name__, url_prefix='/api')
 
+# Shared pool for the network-bound domain research checks. Only pure network
+# helpers are submitted here; anything touching the session or DB stays on the
+# request thread. Under gevent the pool's threads are greenlets, so its width
+# bounds concurrent checks rather than OS threads; the default there lets every
+# one of a worker's 500 connections run all four checks at once.
+if gevent_monkey is not None and gevent_monkey.is_module_patched("threading"):
+    _DEFAULT_CHECK_WORKERS = 500 * 4
+else:
+    _DEFAULT_CHECK_WORKERS = 8
+CHECK_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('DOMAIN_CHECK_WORKERS', _DEFAULT_CHECK_WORKERS)),
+    thread_name_prefix="domain-check",
+)
+CHECK_TIMEOUT_SECONDS = 10
+# Checks that look up the domain's IPv4 address before doing their own work.
+IP_CHECKS = frozenset({"ip_geolocation", "port_scan"})
+
+# Upper bound on how many ports a single /api/port_scan request may probe.
+MAX_SCAN_PORTS = 64
+
+# Read-only diagnostic lookups get a per-minute budget keyed by user + IP.
+DIAGNOSTIC_RATE_LIMIT = "60 per minute"
+
 def _set_assistant_context(tool: str, target: str, summary: str | None = None) -> None:
     """
     Persist the most recent tool context to the session so the assistant can reference it.
@@ -31,20 +61,8 @@ def _set_assistant_context(tool: str, target: str, summary: str | None = None) -
     }
 
 
-def _get_session_user() -> User | None:
-    """
-    Resolve the logged-in user from the session, handling UUID parsing safely.
-    """
-    user_id = session.get("user_id")
-    if not user_id:
-        return None
-    try:
-        user_uuid = uuid.UUID(user_id)
-    except (ValueError, TypeError):
-        return None
-    return User.query.get(user_uuid)
-
 @main_bp.route('/health', methods=['GET'])
+@limiter.exempt
 def health_check():
     """Health check endpoint for Render."""
     return jsonify({"status": "ok"}), 200
@@ -74,7 +92,7 @@ def validate_host_from_request(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         host = data.get("host")
 
         if not host:
@@ -87,25 +105,61 @@ def validate_host_from_request(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def _parse_port(value) -> int | None:
+    """
+    Returns `value` as a TCP port number, or None if it isn't a valid one.
+    """
+    try:
+        port = int(value)
+    except (ValueError, TypeError):
+        return None
+    return port if 1 <= port <= 65535 else None
+
+# Decorator for host + port validation from request body
+def validate_host_port(f):
+    """
+    A decorator that validates the 'host' like `validate_host_from_request` and
+    also parses the port selection.
+
+    A `ports` list is passed to the view as `ports` (deduplicated and sorted);
+    otherwise the single `port` (default 80) is passed as `port`.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        data = request.get_json(silent=True) or {}
+        if "ports" in data:
+            ports = data["ports"]
+            if not isinstance(ports, list) or not ports or len(ports) > MAX_SCAN_PORTS:
+                return jsonify({"error": f"ports must be a list of 1 to {MAX_SCAN_PORTS} port numbers"}), 400
+            parsed = {_parse_port(p) for p in ports}
+            if None in parsed:
+                return jsonify({"error": "Ports must be integers between 1 and 65535"}), 400
+            kwargs['ports'] = sorted(parsed)
+        else:
+            port = _parse_port(data.get("port", 80))
+            if port is None:
+                return jsonify({"error": "Port must be an integer between 1 and 65535"}), 400
+            kwargs['port'] = port
+        return f(*args, **kwargs)
+    return validate_host_from_request(decorated_function)
+
 @main_bp.route('/domain', methods=['POST'])
+@limiter.limit(DIAGNOSTIC_RATE_LIMIT)
 @login_required
 def domain_research():
     """
     Performs a comprehensive research on a domain based on specified fields.
     """
-    data = request.get_json() or {}
-    domain = data.get("domain")
+    data = request.get_json(silent=True) or {}
+    if missing_fields(data, ("domain",)):
+        return jsonify({"error": "Domain is required"}), 400
 
-    if not domain:
-        return jsonify({"error": "Domain is required"}), 400
+    domain = data["domain"]
     if not is_valid_host(domain):
         return jsonify({"error": "Invalid or malicious domain provided"}), 400
 
-    try:
-        port = int(data.get("port", 80))
-        if not 1 <= port <= 65535:
-            raise ValueError("Invalid port number")
-    except (ValueError, TypeError):
+    port = _parse_port(data.get("port", 80))
+    if port is None:
         return jsonify({"error": "Port must be an integer between 1 and 65535"}), 400
 
     allowed_checks = {
@@ -119,18 +173,43 @@ def domain_research():
     if isinstance(requested_fields, str):
         requested_fields = [requested_fields]
 
-    if not isinstance(requested_fields, list):
+    if not isinstance(requested_fields, list) or not all(isinstance(check, str) for check in requested_fields):
         return jsonify({"error": "fields must be a list"}), 400
 
+    # One deadline for the whole request, including the shared resolution below,
+    # so the response time is bounded by it rather than by a timeout per check.
+    deadline = time.monotonic() + CHECK_TIMEOUT_SECONDS
+    checks = [check for check in dict.fromkeys(requested_fields) if check in allowed_checks]
+    futures = {
+        check: CHECK_EXECUTOR.submit(allowed_checks[check])
+        for check in checks
+        if check not in IP_CHECKS
+    }
+    ip_checks = [check for check in checks if check in IP_CHECKS]
+    if ip_checks:
+        # Resolve once, while the other checks run, so the geolocation and port
+        # checks share one cached answer instead of racing each other to the resolver.
+        try:
+            domain_service.resolve_ipv4(domain)
+        except Exception:
+            pass  # Each check reports its own resolution error.
+        futures.update({check: CHECK_EXECUTOR.submit(allowed_checks[check]) for check in ip_checks})
+
+    wait(futures.values(), timeout=max(0, deadline - time.monotonic()))
     results = {"domain": domain}
     for check in requested_fields:
-        if check in allowed_checks:
+        if check not in futures:
+            results[check] = {"error": "unknown check"}
+        elif not futures[check].done():
+            # Drops a check that never started; one already running can't be
+            # interrupted and finishes in the background.
+            futures[check].cancel()
+            results[check] = {"error": f"{check} did not finish within {CHECK_TIMEOUT_SECONDS} seconds"}
+        else:
             try:
-                results[check] = allowed_checks[check]()
+                results[check] = futures[check].result()
             except Exception as e:
                 results[check] = {"error": f"An unexpected error occurred during {check}: {e}"}
-        else:
-            results[check] = {"error": "unknown check"}
 
     _set_assistant_context("domain", domain, f"Domain research for {domain} with {', '.join(requested_fields)}")
     return jsonify(results), 200
@@ -142,7 +221,7 @@ def profile_management():
     """
     Allows users to fetch and update their profile information.
     """
-    user = _get_session_user()
+    user = get_session_user()
 
     if not user:
         return jsonify({"message": "User not found"}), 404
@@ -159,7 +238,7 @@ def profile_management():
         }), 200
 
     elif request.method == 'POST':
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         
         # Basic validation
         if not data:
@@ -192,7 +271,7 @@ def delete_account():
     """
     Allows a logged-in user to delete their own account.
     """
-    user = _get_session_user()
+    user = get_session_user()
 
     if not user:
         return jsonify({"message": "User not found"}), 404
@@ -203,13 +282,13 @@ def delete_account():
         session.clear() # Clear the session after account deletion
         # Log the deletion
         from flask import current_app
-        current_app.logger.info(f"User account deleted: {user.email}")
+        current_app.logger.info("User account deleted: %s", user.email)
         return jsonify({"message": "Account deleted successfully"}), 200
     except Exception as e:
         db.session.rollback()
         # Log the error
         from flask import current_app
-        current_app.logger.error(f"Error deleting user account {user.email}: {str(e)}")
+        current_app.logger.error("Error deleting user account %s: %s", user.email, e)
         return jsonify({"message": f"An error occurred during account deletion: {str(e)}"}), 500
 
 
@@ -230,7 +309,7 @@ def assistant():
     """
     Provides conversational help for dashboard tools.
     """
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
     question = data.get("question")
     if not question:
         return jsonify({"error": "Question text is required."}), 400
@@ -283,6 +362,7 @@ def assistant_status():
         }), 500
 
 @main_bp.route('/whois', methods=['POST'])
+@limiter.limit(DIAGNOSTIC_RATE_LIMIT)
 @login_required
 @validate_host_from_request
 def whois_route(host):
@@ -292,6 +372,7 @@ def whois_route(host):
     return jsonify(result)
 
 @main_bp.route('/geoip', methods=['POST'])
+@limiter.limit(DIAGNOSTIC_RATE_LIMIT)
 @login_required
 @validate_host_from_request
 def geoip_route(host):
@@ -301,6 +382,7 @@ def geoip_route(host):
     return jsonify(result)
 
 @main_bp.route('/dns', methods=['POST'])
+@limiter.limit(DIAGNOSTIC_RATE_LIMIT)
 @login_required
 @validate_host_from_request
 def dns_route(host):
@@ -310,18 +392,21 @@ def dns_route(host):
     return jsonify(result)
 
 @main_bp.route('/port_scan', methods=['POST'])
+@limiter.limit(DIAGNOSTIC_RATE_LIMIT)
 @login_required
-@validate_host_from_request
-def port_scan_route(host):
-    """Performs a port scan on a given host and port."""
-    data = request.get_json()
-    try:
-        port = int(data.get("port", 80))
-        if not 1 <= port <= 65535:
-            raise ValueError("Invalid port number")
-    except (ValueError, TypeError):
-        return jsonify({"error": "Port must be an integer between 1 and 65535"}), 400
-    
+@validate_host_port
+def port_scan_route(host, port=None, ports=None):
+    """
+    Performs a port scan on a given host.
+
+    Accepts either a single `port` or a `ports` list to probe several ports
+    concurrently in one request.
+    """
+    if ports is not None:
+        result = domain_service.scan_ports(host, ports)
+        _set_assistant_context("port_scan", host, f"Port scan on {host} ports {', '.join(map(str, ports))}")
+        return jsonify(result)
+
     result = domain_service.scan_port(host, port)
     _set_assistant_context("port_scan", f"{host}:{port}", f"Port scan on {host}:{port}")
     return jsonify(result)
@@ -329,7 +414,32 @@ def port_scan_route(host):
 @main_bp.route('/speed', methods=['POST'])
 @login_required
 def speed_route():
-    """Performs a network speed test."""
-    result = domain_service.get_speed_test()
+    """
+    Returns the latest server speed test.
+
+    Responds with 202 while a background measurement is still running; the
+    client should poll until it receives the results.
+    """
+    return _speed_response(domain_service.get_speed_test())
+
+@main_bp.route('/speed', methods=['GET'])
+@limiter.limit(DIAGNOSTIC_RATE_LIMIT)
+@login_required
+def speed_status():
+    """
+    Polls the server speed test without starting one.
+
+    The run's state is shared by every worker on the host, so any of them can
+    answer. Responds with 404 when there is neither a result nor a run in
+    flight; POST starts one.
+    """
+    result = domain_service.peek_speed_test()
+    if result is None:
+        return jsonify({"error": "No speed test is running. Start one with POST /api/speed."}), 404
+    return _speed_response(result)
+
+def _speed_response(result):
+    if result.get("status") == "measuring":
+        return jsonify(result), 202
     _set_assistant_context("speed_test", "local", "Recent speed test")
     return jsonify(result)
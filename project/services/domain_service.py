@@ -7,15 +7,162 @@ like WHOIS, DNS lookups, geolocation, port scanning, and speed tests,
 separating the core business logic from the web-facing routes.
 """
 
+import asyncio
+import contextlib
+import os
 import socket
+import struct
 import datetime
+import ipaddress
+import tempfile
+import threading
+import time
 from typing import Any, Optional, Dict, List
 
+import orjson
 import requests
 import speedtest
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import dns.asyncresolver
 import dns.resolver
 import whois
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    from gevent import monkey as gevent_monkey
+    from gevent.pool import Pool as GreenletPool
+except ImportError:
+    gevent_monkey = None
+
+from ..utils import TTLCache
+
+DNS_RECORD_TYPES = ('A', 'AAAA', 'MX', 'CNAME', 'TXT')
+
+# Shared resolvers so /etc/resolv.conf is parsed once per process rather than per lookup.
+# EDNS0 with a 4 KB payload keeps large TXT answers in one UDP packet instead of
+# retrying over TCP, and both resolvers share one LRU cache so answers fetched
+# by either are reused within their TTL.
+_DNS_CACHE = dns.resolver.LRUCache(max_size=10000)
+
+_ASYNC_RESOLVER = dns.asyncresolver.Resolver()
+_ASYNC_RESOLVER.timeout = 2
+_ASYNC_RESOLVER.lifetime = 3
+_ASYNC_RESOLVER.use_edns(0, 0, 4096)
+_ASYNC_RESOLVER.cache = _DNS_CACHE
+
+# Used for the A lookup behind geolocation and port scans, which run on worker
+# threads rather than inside an event loop, and for record lookups under gevent.
+_RESOLVER = dns.resolver.Resolver()
+_RESOLVER.timeout = 2
+_RESOLVER.lifetime = 2
+_RESOLVER.use_edns(0, 0, 4096)
+_RESOLVER.cache = _DNS_CACHE
+
+# Registrar WHOIS data changes over days and the servers rate-limit aggressively,
+# while ip-api results for an address are stable for hours. Host lookups are
+# kept for five minutes, in line with common A-record TTLs.
+_WHOIS_CACHE = TTLCache(maxsize=4096, ttl=86400)
+_GEO_CACHE = TTLCache(maxsize=4096, ttl=3600)
+_HOST_CACHE = TTLCache(maxsize=8192, ttl=300)
+# Formatted DNS answers per domain, kept for the shortest record TTL (at most
+# five minutes). Negative answers are kept for a minute.
+_DNS_RESULT_CACHE = TTLCache(maxsize=4096, ttl=300)
+_DNS_NEGATIVE_TTL = 60
+
+# SO_LINGER with a zero timeout makes close() send RST, so repeated scans don't
+# leave sockets parked in TIME_WAIT.
+_LINGER_RESET = struct.pack("ii", 1, 0)
+_LAN_SCAN_TIMEOUT = 0.5
+_WAN_SCAN_TIMEOUT = 1
+# Caps the sockets one multi-port scan holds open at a time; with many gevent
+# connections per worker an unbounded fan-out could exhaust file descriptors.
+_MAX_CONCURRENT_PROBES = 32
+
+# Reused for ip-api lookups so repeat calls ride an existing keep-alive connection.
+_HTTP = requests.Session()
+_HTTP.mount("http://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=64,
+    max_retries=Retry(total=2, backoff_factor=0.1, status_forcelist=[429, 500, 502, 503, 504]),
+))
+# (connect, read): fail fast if ip-api is unreachable, but allow a slow reply.
+GEO_TIMEOUT = (2, 5)
+
+# A speed test takes tens of seconds and measures the server, not the caller, so
+# one measurement per host is run in the background and reused for a while. Its
+# state lives in the temp directory, so every worker process sees the same run,
+# and a file lock keeps two processes from measuring at once. A run still marked
+# as measuring after SPEED_STALE_SECONDS is assumed to have died with its worker.
+SPEED_RESULT_TTL = 600
+SPEED_ERROR_TTL = 60
+SPEED_STALE_SECONDS = 180
+_SPEED_STATE_PATH = os.path.join(tempfile.gettempdir(), "vantage-speedtest.json")
+_SPEED_LOCK_PATH = _SPEED_STATE_PATH + ".lock"
+_SPEED_LOCK = threading.Lock()
+_speed_test_running = False
+
+WHOIS_FIELDS = ("domain_name", "registrar", "creation_date", "expiration_date", "name_servers", "status")
+WHOIS_DATE_FIELDS = frozenset({"creation_date", "expiration_date"})
+
+def _under_gevent() -> bool:
+    """
+    True when gevent has patched the standard library (gunicorn's gevent worker).
+
+    asyncio tracks its running loop per OS thread and every greenlet shares the
+    worker's thread, so a second greenlet calling asyncio.run while another is
+    suspended inside one would fail. Under gevent the concurrent lookups run as
+    plain blocking calls on greenlets instead, which the patched sockets make
+    cooperative.
+    """
+    return gevent_monkey is not None and gevent_monkey.is_module_patched("socket")
+
+def _capture(func, *args, **kwargs):
+    """Calls `func`, returning any exception instead of raising it."""
+    try:
+        return func(*args, **kwargs)
+    except Exception as e:
+        return e
+
+def resolve_ipv4(domain: str) -> str:
+    """
+    Resolves a hostname to an IPv4 address, reusing recent answers.
+
+    IPv4 literals are returned as-is. Names are looked up with the shared
+    dnspython resolver, and names DNS doesn't know (e.g. hosts-file entries
+    such as 'localhost') fall back to the system resolver.
+
+    Args:
+        domain: The hostname or IP address to resolve.
+
+    Returns:
+        The resolved IPv4 address as a string.
+    """
+    key = domain.lower().strip()
+    ip_address = _HOST_CACHE.get(key)
+    if ip_address is None:
+        ip_address = _lookup_ipv4(key)
+        _HOST_CACHE.set(key, ip_address)
+    return ip_address
+
+def _lookup_ipv4(host: str) -> str:
+    """
+    Uncached IPv4 resolution behind `resolve_ipv4`.
+    """
+    if host[:1].isdigit():
+        try:
+            return str(ipaddress.IPv4Address(host))
+        except ValueError:
+            pass
+    try:
+        return _RESOLVER.resolve(host, "A")[0].to_text()
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+        return socket.getaddrinfo(host, None, socket.AF_INET, socket.SOCK_STREAM)[0][4][0]
+
 def get_whois_data(domain: str) -> Dict[str, Any]:
     """
     Retrieves WHOIS information for a given domain.
@@ -26,34 +173,32 @@ def get_whois_data(domain: str) -> Dict[str, Any]:
     Returns:
         A dictionary containing key WHOIS data, or an error dictionary.
     """
+    domain = domain.lower().strip()
+    cached = _WHOIS_CACHE.get(domain)
+    if cached is not None:
+        return cached
     try:
         w = whois.whois(domain)
-
-        def _get(key: str) -> Any:
-            return w.get(key) if isinstance(w, dict) else getattr(w, key, None)
-
-        def _iso(val: Any) -> Optional[str]:
-            if val is None:
-                return None
-            if isinstance(val, list):
-                val = val[0] if val else None
-                if val is None:
-                    return None
-            if isinstance(val, (datetime.datetime, datetime.date)):
-                return val.isoformat()
-            return str(val)
-
-        return {
-            "domain_name": _get("domain_name"),
-            "registrar": _get("registrar"),
-            "creation_date": _iso(_get("creation_date")),
-            "expiration_date": _iso(_get("expiration_date")),
-            "name_servers": _get("name_servers"),
-            "status": _get("status"),
-        }
+        getter = w.get if isinstance(w, dict) else lambda key: getattr(w, key, None)
+        result = {}
+        for field in WHOIS_FIELDS:
+            value = getter(field)
+            result[field] = _whois_date(value) if field in WHOIS_DATE_FIELDS else value
+        _WHOIS_CACHE.set(domain, result)
+        return result
     except Exception as e:
         return {"error": str(e)}
 
+def _whois_date(val: Any) -> Optional[str]:
+    """Normalizes a WHOIS date (possibly a list of dates) to an ISO string."""
+    if isinstance(val, list):
+        val = val[0] if val else None
+    if val is None:
+        return None
+    if isinstance(val, (datetime.datetime, datetime.date)):
+        return val.isoformat()
+    return str(val)
+
 def get_dns_records(domain: str) -> Dict[str, Any]:
     """
     Resolves various DNS record types for a given domain.
@@ -65,15 +210,58 @@ def get_dns_records(domain: str) -> Dict[str, Any]:
         A dictionary where keys are record types (A, AAAA, MX, etc.)
         and values are lists of records or an error dictionary.
     """
-    records = {}
-    for record_type in ['A', 'AAAA', 'MX', 'CNAME', 'TXT']:
-        try:
-            answers = dns.resolver.resolve(domain, record_type)
-            records[record_type] = [str(rdata) for rdata in answers]
-        except Exception as e:
-            records[record_type] = {"error": str(e)}
+    key = domain.lower().strip()
+    cached = _DNS_RESULT_CACHE.get(key)
+    if cached is not None:
+        return cached
+    if _under_gevent():
+        pool = GreenletPool(len(DNS_RECORD_TYPES))
+        answers = pool.map(
+            lambda record_type: _capture(_RESOLVER.resolve, domain, record_type, lifetime=_ASYNC_RESOLVER.lifetime),
+            DNS_RECORD_TYPES,
+        )
+        records, ttl = _format_dns_answers(answers)
+    else:
+        records, ttl = asyncio.run(_resolve_all(domain))
+    if ttl is not None:
+        _DNS_RESULT_CACHE.set(key, records, ttl=ttl)
     return records
 
+async def _resolve_all(domain: str) -> tuple[Dict[str, Any], Optional[float]]:
+    """
+    Issues every DNS record query concurrently so the total wait is bounded by
+    the slowest single lookup instead of the sum of all of them.
+    """
+    answers = await asyncio.gather(
+        *(_ASYNC_RESOLVER.resolve(domain, record_type) for record_type in DNS_RECORD_TYPES),
+        return_exceptions=True,
+    )
+    return _format_dns_answers(answers)
+
+def _format_dns_answers(answers: List[Any]) -> tuple[Dict[str, Any], Optional[float]]:
+    """
+    Formats one answer (or exception) per entry of DNS_RECORD_TYPES.
+
+    Returns the formatted records and how long they may be cached, or None if a
+    lookup failed transiently (e.g. timed out) and the result shouldn't be kept.
+    """
+    records = {}
+    ttl = _DNS_RESULT_CACHE.ttl
+    found = False
+    for record_type, answer in zip(DNS_RECORD_TYPES, answers):
+        if isinstance(answer, Exception):
+            records[record_type] = {"error": str(answer)}
+            if not isinstance(answer, (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer)):
+                ttl = None
+        else:
+            records[record_type] = [str(rdata) for rdata in answer]
+            found = True
+            if ttl is not None:
+                ttl = min(ttl, answer.rrset.ttl)
+    if ttl is not None and not found:
+        ttl = _DNS_NEGATIVE_TTL
+    return records, ttl
+
 def get_ip_geolocation(domain: str) -> Dict[str, Any]:
     """
     Performs an IP geolocation lookup for a given domain.
@@ -85,10 +273,19 @@ def get_ip_geolocation(domain: str) -> Dict[str, Any]:
         A dictionary containing geolocation data or an error dictionary.
     """
     try:
-        ip_address = socket.gethostbyname(domain)
-        response = requests.get(f"http://ip-api.com/json/{ip_address}")
+        ip_address = resolve_ipv4(domain)
+        cached = _GEO_CACHE.get(ip_address)
+        if cached is not None:
+            return cached
+        response = _HTTP.get(f"http://ip-api.com/json/{ip_address}", timeout=GEO_TIMEOUT)
         response.raise_for_status()
-        return response.json()
+        # response.content reads the whole body, so the connection goes straight
+        # back to the pool; orjson then parses the bytes without decoding to str.
+        result = orjson.loads(response.content)
+        # ip-api reports lookup failures with a 200 and status="fail"; don't pin those.
+        if result.get("status") == "success":
+            _GEO_CACHE.set(ip_address, result)
+        return result
     except Exception as e:
         return {"error": str(e)}
 
@@ -105,15 +302,180 @@ def scan_port(domain: str, port: int) -> Dict[str, Any]:
         or an error dictionary.
     """
     try:
-        ip_address = socket.gethostbyname(domain)
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.settimeout(1)
-            result = sock.connect_ex((ip_address, port))
-            return {"port": port, "status": "open" if result == 0 else "closed"}
+        ip_address = resolve_ipv4(domain)
+        return {"port": port, "status": _probe_port(ip_address, port)}
     except Exception as e:
         return {"error": str(e)}
 
+def scan_ports(domain: str, ports: List[int]) -> Dict[str, Any]:
+    """
+    Scans several ports on a given domain concurrently.
+
+    The domain is resolved once up front and every port is probed with a
+    non-blocking connect on a single event loop (or, under gevent, a blocking
+    connect per greenlet), so one request can probe many ports at once.
+
+    Args:
+        domain: The domain name to scan.
+        ports: The port numbers to check.
+
+    Returns:
+        A dictionary with a `ports` list of per-port results (each shaped like
+        `scan_port`'s output), or an error dictionary.
+    """
+    try:
+        ip_address = resolve_ipv4(domain)
+    except Exception as e:
+        return {"error": str(e)}
+
+    if _under_gevent():
+        pool = GreenletPool(_MAX_CONCURRENT_PROBES)
+        statuses = pool.map(lambda port: _capture(_probe_port, ip_address, port), ports)
+        return {"ports": _port_results(ports, statuses)}
+    return {"ports": asyncio.run(_probe_all(ip_address, ports))}
+
+def _scan_timeout(ip_address: str) -> float:
+    """LAN targets answer quickly, so they get a shorter connect timeout."""
+    return _LAN_SCAN_TIMEOUT if ipaddress.ip_address(ip_address).is_private else _WAN_SCAN_TIMEOUT
+
+def _probe_port(ip_address: str, port: int) -> str:
+    """Returns 'open' or 'closed' for a single TCP connect attempt."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RESET)
+        sock.settimeout(_scan_timeout(ip_address))
+        result = sock.connect_ex((ip_address, port))
+        return "open" if result == 0 else "closed"
+
+async def _probe_all(ip_address: str, ports: List[int]) -> List[Dict[str, Any]]:
+    """
+    Probes every port concurrently and returns per-port results in input order.
+    """
+    timeout = _scan_timeout(ip_address)
+    semaphore = asyncio.Semaphore(_MAX_CONCURRENT_PROBES)
+
+    async def _bounded(port: int) -> str:
+        async with semaphore:
+            return await _probe_port_async(ip_address, port, timeout)
+
+    statuses = await asyncio.gather(*(_bounded(port) for port in ports), return_exceptions=True)
+    return _port_results(ports, statuses)
+
+def _port_results(ports: List[int], statuses: List[Any]) -> List[Dict[str, Any]]:
+    """Pairs each port with its probe status, or the error its probe raised."""
+    return [
+        {"port": port, "error": str(status)} if isinstance(status, Exception) else {"port": port, "status": status}
+        for port, status in zip(ports, statuses)
+    ]
+
+async def _probe_port_async(ip_address: str, port: int, timeout: float) -> str:
+    """Non-blocking counterpart of `_probe_port` for use on an event loop."""
+    loop = asyncio.get_running_loop()
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RESET)
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, (ip_address, port)), timeout)
+        except (asyncio.TimeoutError, OSError):
+            return "closed"
+        return "open"
+
 def get_speed_test() -> Dict[str, Any]:
+    """
+    Returns the most recent server speed test, starting a new one if needed.
+
+    The measurement runs in a background thread; until it completes callers
+    receive `{"status": "measuring"}` and are expected to poll again.
+
+    Returns:
+        A dictionary containing download/upload speeds in Mbps and ping in ms,
+        a measuring status, or an error dictionary.
+    """
+    current = peek_speed_test()
+    if current is not None:
+        return current
+    _start_speed_test()
+    return {"status": "measuring"}
+
+def peek_speed_test() -> Optional[Dict[str, Any]]:
+    """
+    Returns the state of the server speed test without starting one.
+
+    Returns:
+        The most recent result or error, `{"status": "measuring"}` while a run
+        is in flight on this host, or None if there is neither.
+    """
+    state = _read_speed_state()
+    if state is None:
+        return {"status": "measuring"} if _speed_test_running else None
+    if "result" in state:
+        return state["result"]
+    return {"status": "measuring"}
+
+def _read_speed_state() -> Optional[Dict[str, Any]]:
+    """Returns the shared speed test state, or None if it is missing or expired."""
+    try:
+        with open(_SPEED_STATE_PATH, "rb") as state_file:
+            state = orjson.loads(state_file.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    result = state.get("result")
+    if result is None:
+        ttl = SPEED_STALE_SECONDS
+    elif "error" in result:
+        ttl = SPEED_ERROR_TTL
+    else:
+        ttl = SPEED_RESULT_TTL
+    return state if time.time() - state.get("at", 0) < ttl else None
+
+def _write_speed_state(state: Dict[str, Any]) -> None:
+    """Replaces the shared speed test state atomically."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(_SPEED_STATE_PATH))
+    with os.fdopen(fd, "wb") as tmp_file:
+        tmp_file.write(orjson.dumps({**state, "at": time.time()}))
+    os.replace(tmp_path, _SPEED_STATE_PATH)
+
+def _lock_speed_test():
+    """
+    Takes the host-wide speed test lock without waiting.
+
+    Returns:
+        An open lock file, released when it is closed; a no-op context where
+        file locks are unavailable; or None if another process holds the lock.
+    """
+    if fcntl is None:
+        return contextlib.nullcontext()
+    lock_file = open(_SPEED_LOCK_PATH, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+def _start_speed_test() -> None:
+    """Launches a background speed test unless one is already in flight on this host."""
+    global _speed_test_running
+    with _SPEED_LOCK:
+        if _speed_test_running:
+            return
+        lock = _lock_speed_test()
+        if lock is None:
+            return
+        _speed_test_running = True
+    # Marked before returning, so a poll reaching another worker sees the run.
+    _write_speed_state({"status": "measuring"})
+    threading.Thread(target=_run_speed_test, args=(lock,), daemon=True).start()
+
+def _run_speed_test(lock) -> None:
+    global _speed_test_running
+    try:
+        with lock:
+            _write_speed_state({"result": _measure_speed()})
+    finally:
+        with _SPEED_LOCK:
+            _speed_test_running = False
+
+def _measure_speed() -> Dict[str, Any]:
     """
     Performs a network speed test to measure download, upload, and ping.
 
@@ -8,8 +8,26 @@ specifics of the API calls.
 """
 
 import os
+import queue
+import logging
+import threading
 import requests
 
+logger = logging.getLogger(__name__)
+
+SENDGRID_SEND_URL = "https://api.sendgrid.com/v3/mail/send"
+
+# Shared session so consecutive emails reuse the pooled TLS connection to
+# SendGrid instead of paying a fresh handshake per message.
+_SENDGRID = requests.Session()
+
+# Feedback notifications are drained by one background worker from a bounded
+# queue, so a burst of submissions can't spawn an unbounded number of threads.
+FEEDBACK_QUEUE_MAXSIZE = 1024
+_feedback_queue = queue.Queue(maxsize=FEEDBACK_QUEUE_MAXSIZE)
+_feedback_worker = None
+_feedback_worker_lock = threading.Lock()
+
 def _send_email(user_email: str, subject: str, body: str):
     """
     A generic helper function to send an email via SendGrid.
@@ -18,7 +36,7 @@ def _send_email(user_email: str, subject: str, body: str):
     verified_sender = os.environ.get('VERIFIED_SENDER_EMAIL')
 
     if not sendgrid_api_key or not verified_sender:
-        print(f"Email service not configured. Skipping email to {user_email}.")
+        logger.warning("Email service not configured. Skipping email to %s.", user_email)
         return False
 
     payload = {
@@ -29,22 +47,22 @@ def _send_email(user_email: str, subject: str, body: str):
     }
 
     try:
-        response = requests.post(
-            "https://api.sendgrid.com/v3/mail/send",
+        response = _SENDGRID.post(
+            SENDGRID_SEND_URL,
             headers={"Authorization": f"Bearer {sendgrid_api_key}"},
             json=payload
         )
         if 200 <= response.status_code < 300:
-            print(f"Email sent successfully to {user_email}.")
+            logger.info("Email sent successfully to %s.", user_email)
             return True
         else:
-            print(f"Failed to send email to {user_email}. Status: {response.status_code}, Body: {response.text}")
+            logger.error("Failed to send email to %s. Status: %s, Body: %s", user_email, response.status_code, response.text)
             return False
     except requests.exceptions.RequestException as e:
-        print(f"A network exception occurred while sending email: {e}")
+        logger.error("A network exception occurred while sending email: %s", e)
         return False
     except Exception as e:
-        print(f"An unexpected error occurred in _send_email: {e}")
+        logger.error("An unexpected error occurred in _send_email: %s", e, exc_info=True)
         return False
 
 def send_otp_email(user_email: str, otp: str):
@@ -111,7 +129,7 @@ def send_feedback_email(name: str, email: str, subject: str, message: str):
     verified_sender = os.environ.get('VERIFIED_SENDER_EMAIL')
 
     if not all([sendgrid_api_key, admin_email, verified_sender]):
-        print("Email service not fully configured (SENDGRID_API_KEY, ADMIN_EMAIL, or VERIFIED_SENDER_EMAIL is missing). Skipping email send.")
+        logger.warning("Email service not fully configured (SENDGRID_API_KEY, ADMIN_EMAIL, or VERIFIED_SENDER_EMAIL is missing). Skipping email send.")
         return
 
     email_body = f"""
@@ -134,17 +152,59 @@ def send_feedback_email(name: str, email: str, subject: str, message: str):
     }
 
     try:
-        response = requests.post(
-            "https://api.sendgrid.com/v3/mail/send",
+        response = _SENDGRID.post(
+            SENDGRID_SEND_URL,
             headers={"Authorization": f"Bearer {sendgrid_api_key}"},
             json=payload
         )
         # Check for successful status codes (2xx)
         if 200 <= response.status_code < 300:
-            print("Feedback email sent successfully via SendGrid.")
+            logger.info("Feedback email sent successfully via SendGrid.")
         else:
-            print(f"Failed to send email via SendGrid. Status: {response.status_code}, Body: {response.text}")
+            logger.error("Failed to send email via SendGrid. Status: %s, Body: %s", response.status_code, response.text)
     except requests.exceptions.RequestException as e:
-        print(f"A network exception occurred while sending email via SendGrid: {e}")
+        logger.error("A network exception occurred while sending email via SendGrid: %s", e)
     except Exception as e:
-        print(f"An unexpected error occurred in send_feedback_email: {e}")
+        logger.error("An unexpected error occurred in send_feedback_email: %s", e, exc_info=True)
+
+
+def feedback_queue_full() -> bool:
+    """
+    Reports whether the feedback notification queue is at capacity.
+    """
+    return _feedback_queue.full()
+
+
+def queue_feedback_email(name: str, email: str, subject: str, message: str) -> bool:
+    """
+    Queues a feedback notification for the background sender.
+
+    Returns:
+        True if the email was queued, False if the queue is full.
+    """
+    _ensure_feedback_worker()
+    try:
+        _feedback_queue.put_nowait((name, email, subject, message))
+    except queue.Full:
+        return False
+    return True
+
+
+def _ensure_feedback_worker():
+    """
+    Starts the feedback sender thread on first use (after any worker fork).
+    """
+    global _feedback_worker
+    with _feedback_worker_lock:
+        if _feedback_worker is None or not _feedback_worker.is_alive():
+            _feedback_worker = threading.Thread(target=_drain_feedback_queue, name="feedback-mailer", daemon=True)
+            _feedback_worker.start()
+
+
+def _drain_feedback_queue():
+    while True:
+        args = _feedback_queue.get()
+        try:
+            send_feedback_email(*args)
+        finally:
+            _feedback_queue.task_done()
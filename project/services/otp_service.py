@@ -2,10 +2,29 @@
 Service for handling One-Time Password (OTP) generation and verification.
 """
 
+import functools
 import hashlib
 import os
 import secrets
 
+@functools.lru_cache(maxsize=1)
+def _salted_sha256():
+    """
+    Returns a SHA256 object already fed with OTP_SALT, read from the
+    environment once per process. Callers copy it before hashing an OTP.
+    """
+    salt = os.environ.get('OTP_SALT')
+    if not salt:
+        raise ValueError("OTP_SALT environment variable is not set.")
+    return hashlib.sha256(salt.encode())
+
+def _digest(otp):
+    # str() keeps accepting an OTP submitted as a JSON number, as the original
+    # f-string did.
+    digest = _salted_sha256().copy()
+    digest.update(str(otp).encode())
+    return digest.hexdigest()
+
 def generate_otp(length=6):
     """
     Generates a secure random OTP of a specified length.
@@ -28,10 +47,7 @@ def hash_otp(otp):
     Returns:
         str: The hex digest of the hashed OTP.
     """
-    salt = os.environ.get('OTP_SALT')
-    if not salt:
-        raise ValueError("OTP_SALT environment variable is not set.")
-    return hashlib.sha256(f"{salt}{otp}".encode()).hexdigest()
+    return _digest(otp)
 
 def verify_otp(submitted_otp, stored_hash):
     """
@@ -44,8 +60,4 @@ def verify_otp(submitted_otp, stored_hash):
     Returns:
         bool: True if the OTP is valid, False otherwise.
     """
-    salt = os.environ.get('OTP_SALT')
-    if not salt:
-        raise ValueError("OTP_SALT environment variable is not set.")
-    hashed_input = hashlib.sha256(f"{salt}{submitted_otp}".encode()).hexdigest()
-    return hashed_input == stored_hash
+    return _digest(submitted_otp) == stored_hash
@@ -0,0 +1,122 @@
+"""
+Service for hashing and verifying account passwords.
+
+New passwords are hashed with Argon2id. Hashes stored before the switch are
+bcrypt and keep verifying; `needs_rehash` tells callers when a stored hash
+should be replaced after a successful login.
+
+Hashing runs on a fixed pool of threads (argon2-cffi and bcrypt release the
+GIL while they work), and only a bounded number of operations may wait for it.
+Under gevent the pool is gevent's own, whose workers are native threads;
+the standard executor's threads would be greenlets there and hashing would
+block every other request on the worker.
+Beyond that `HasherBusy` is raised so the request can be answered with a 503
+instead of queueing indefinitely.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+
+try:
+    from gevent import monkey as gevent_monkey
+    from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+except ImportError:
+    gevent_monkey = None
+
+# Cost parameters can be tuned per deployment (memory_cost is in KiB). Stored
+# hashes made with other parameters still verify and are upgraded on login.
+_HASHER = PasswordHasher(
+    time_cost=int(os.environ.get('ARGON2_TIME_COST', '2')),
+    memory_cost=int(os.environ.get('ARGON2_MEMORY_COST', '65536')),
+    parallelism=int(os.environ.get('ARGON2_PARALLELISM', '4')),
+)
+
+# Verified against when a login names an unknown account, so that path costs
+# the same hashing work as a wrong password for a real one.
+_DUMMY_HASH = _HASHER.hash("vantage-dummy-password")
+
+# Setting PASSWORD_DISABLE_REHASH keeps stored hashes untouched on login, e.g.
+# while trialling new cost parameters before committing every account to them.
+_REHASH_ON_LOGIN = os.environ.get('PASSWORD_DISABLE_REHASH', '').lower() not in {"1", "true", "yes", "on"}
+
+# Each Argon2 hash holds memory_cost (64 MiB by default) while it runs, and
+# os.cpu_count() reports the host's CPUs rather than a container's quota, so
+# the default width stays small; raise PASSWORD_POOL_SIZE where memory allows.
+_POOL_SIZE = int(os.environ.get('PASSWORD_POOL_SIZE', min(os.cpu_count() or 1, 2)))
+# gevent patches before the app is imported (run.py, the gunicorn worker), so
+# the choice can be made once here.
+if gevent_monkey is not None and gevent_monkey.is_module_patched("threading"):
+    _POOL = NativeThreadPoolExecutor(max_workers=_POOL_SIZE)
+else:
+    _POOL = ThreadPoolExecutor(max_workers=_POOL_SIZE, thread_name_prefix="password")
+_PENDING = threading.BoundedSemaphore(int(os.environ.get('PASSWORD_MAX_PENDING', '64')))
+
+class HasherBusy(Exception):
+    """Raised when too many password operations are already in flight."""
+
+def _run(func, *args):
+    if not _PENDING.acquire(blocking=False):
+        raise HasherBusy()
+    try:
+        return _POOL.submit(func, *args).result()
+    finally:
+        _PENDING.release()
+
+def hash_password(password):
+    """
+    Hashes a password with Argon2id for storage.
+
+    Returns:
+        str: The encoded hash, including its parameters and salt.
+
+    Raises:
+        HasherBusy: If the hashing pool is saturated.
+    """
+    return _run(_HASHER.hash, password)
+
+def verify_password(stored_hash, password):
+    """
+    Verifies a password against a stored Argon2id or legacy bcrypt hash.
+
+    Args:
+        stored_hash (str | None): The stored hash, or None for an unknown
+            account, in which case a dummy hash is checked and False returned.
+        password (str): The submitted password.
+
+    Returns:
+        bool: True if the password matches, False otherwise.
+
+    Raises:
+        HasherBusy: If the hashing pool is saturated.
+    """
+    return _run(_verify, stored_hash, password)
+
+def needs_rehash(stored_hash):
+    """
+    Returns True if a stored hash is bcrypt or uses outdated Argon2 parameters,
+    unless rehashing has been disabled for this deployment.
+    """
+    if not _REHASH_ON_LOGIN:
+        return False
+    return not stored_hash.startswith("$argon2") or _HASHER.check_needs_rehash(stored_hash)
+
+def _verify(stored_hash, password):
+    if stored_hash is None:
+        _check_argon2(_DUMMY_HASH, password)
+        return False
+    if stored_hash.startswith("$argon2"):
+        return _check_argon2(stored_hash, password)
+    try:
+        return bcrypt.checkpw(password.encode("utf-8"), stored_hash.encode("utf-8"))
+    except ValueError:
+        return False
+
+def _check_argon2(stored_hash, password):
+    try:
+        return _HASHER.verify(stored_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
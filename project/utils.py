@@ -7,7 +7,74 @@ includes validators, formatters, and other general-purpose tools.
 """
 
 import re
+import time
+import functools
 import ipaddress
+import threading
+import uuid
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+from flask import g, session
+
+from .extensions import db
+from .models import User
+
+# Characters commonly used for command injection, plus backslashes and any whitespace.
+_FORBIDDEN_HOST_CHARS_RE = re.compile(r"[;|&`$()<>\\\s]")
+
+# Hostname format according to RFC 1035; allows domains like 'localhost' and standard TLDs.
+_HOSTNAME_RE = re.compile(
+    r"^(?:[a-zA-Z0-9]"  # First character of a label
+    r"(?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)"  # Subsequent characters of a label
+    r"+[a-zA-Z]{2,6}\Z"  # TLD (\Z, unlike $, rejects a trailing newline)
+)
+
+# Only strings made of these characters can be an IPv6 literal.
+_IP_CHARSET_RE = re.compile(r"[0-9A-Fa-f:.]+\Z")
+
+# RFC 1035 caps a full domain name at 253 characters.
+_MAX_HOST_LENGTH = 253
+
+# Upper bound on any single text field accepted from a JSON request body.
+MAX_FIELD_LENGTH = 5000
+
+def missing_fields(data: Any, fields: Iterable[str]) -> List[str]:
+    """
+    Returns the names of required fields that are absent or unusable in a request body.
+
+    A field counts as missing when it is not a string or is blank. Routes call
+    this before touching the database so that malformed requests are rejected
+    from their shape alone.
+
+    Args:
+        data: The parsed JSON body (anything other than a dict fails every field).
+        fields: The names of the fields that must be present.
+
+    Returns:
+        The offending field names, in the order given; empty if all are valid.
+    """
+    if not isinstance(data, dict):
+        return list(fields)
+    return [
+        field for field in fields
+        if not isinstance(data.get(field), str) or not data[field].strip()
+    ]
+
+def too_long_fields(data: Dict[str, Any], fields: Iterable[str], max_length: int = MAX_FIELD_LENGTH) -> List[str]:
+    """
+    Returns the names of fields longer than `max_length` characters.
+
+    Call it after `missing_fields` has passed, so every field is a string.
+
+    Args:
+        data: The parsed JSON body.
+        fields: The names of the fields to check.
+        max_length: The maximum accepted length of each field.
+
+    Returns:
+        The offending field names, in the order given; empty if all fit.
+    """
+    return [field for field in fields if len(data[field]) > max_length]
 
 def is_valid_host(host: str) -> bool:
     """
@@ -22,25 +89,113 @@ def is_valid_host(host: str) -> bool:
     Returns:
         True if the host is valid, False otherwise.
     """
-    if not host or not isinstance(host, str) or host.startswith('-'):
+    # Type and length are checked before the cache so that unhashable or
+    # oversized input never becomes a cache key.
+    if not host or not isinstance(host, str) or len(host) > _MAX_HOST_LENGTH:
         return False
-    
+    return _check_host(host)
+
+@functools.lru_cache(maxsize=8192)
+def _check_host(host: str) -> bool:
+    """
+    Memoized format checks behind `is_valid_host`; users tend to re-run
+    several tools against the same host.
+    """
+    if host.startswith('-'):
+        return False
+
     # Block common command injection and malicious characters
-    if any(char in host for char in ";|&`$()<>"):
+    if _FORBIDDEN_HOST_CHARS_RE.search(host):
         return False
 
-    # Check if it's a valid IP address
-    try:
-        ipaddress.ip_address(host)
+    # Dotted-quad IPv4 is checked with plain string operations.
+    if _is_ipv4(host):
         return True
-    except ValueError:
-        pass
+
+    # Only IPv6 literals contain a colon (no hostname may), so only those go
+    # through the exception-raising ipaddress parse.
+    if ':' in host:
+        if not _IP_CHARSET_RE.match(host):
+            return False
+        try:
+            ipaddress.IPv6Address(host)
+            return True
+        except ValueError:
+            return False
 
     # If not an IP, check if it's a valid hostname according to RFC 1035
-    # This regex allows for domains like 'localhost' and standard TLDs.
-    hostname_regex = re.compile(
-        r"^(?:[a-zA-Z0-9]"  # First character of a label
-        r"(?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)"  # Subsequent characters of a label
-        r"+[a-zA-Z]{2,6}$"  # TLD
+    return _HOSTNAME_RE.match(host) is not None
+
+
+def _is_ipv4(host: str) -> bool:
+    """
+    True if `host` is a dotted-quad IPv4 address, accepting exactly what
+    `ipaddress.IPv4Address` does (four decimal octets, no leading zeros).
+    """
+    parts = host.split('.')
+    return len(parts) == 4 and all(
+        part.isascii() and part.isdigit() and len(part) <= 3
+        and (part == '0' or part[0] != '0') and int(part) <= 255
+        for part in parts
     )
-    return hostname_regex.match(host) is not None
+
+
+def get_session_user() -> Optional[User]:
+    """
+    Returns the logged-in user for the current request, or None.
+
+    The session's user_id is resolved with at most one query per request; the
+    result, including a miss, is kept on `g` for any later caller. Sessions
+    store the id as its 16 raw bytes; string ids from older sessions are
+    still accepted.
+    """
+    if "_session_user" not in g:
+        user = None
+        user_id = session.get("user_id")
+        if user_id:
+            try:
+                pk = uuid.UUID(bytes=user_id) if isinstance(user_id, bytes) else uuid.UUID(user_id)
+                user = db.session.get(User, pk)
+            except (ValueError, TypeError):
+                pass
+        g._session_user = user
+    return g._session_user
+
+
+class TTLCache:
+    """
+    A small thread-safe in-memory cache whose entries expire after a fixed TTL.
+
+    Entries are kept in insertion order so the oldest one can be evicted in
+    O(1) once `maxsize` is exceeded, mirroring the assistant's answer cache.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: Dict[Hashable, tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the cached value for `key`, or `default` if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Stores `value` under `key`, evicting the oldest entry when full.
+
+        `ttl` overrides the cache-wide TTL for this entry.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            if len(self._entries) > self.maxsize:
+                del self._entries[next(iter(self._entries))]
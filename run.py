@@ -8,6 +8,18 @@ development server.
 It also defines a custom CLI command `flask db-init` to initialize the database.
 """
 import click
+
+try:
+    from gevent import monkey
+except ImportError:
+    monkey = None
+
+# Under gunicorn's gevent worker the standard library is already patched; make
+# psycopg2 cooperative too so a slow query yields instead of blocking the worker.
+if monkey is not None and monkey.is_module_patched("socket"):
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
 from project import create_app
 from project.extensions import db
 from project.models import User, Feedback
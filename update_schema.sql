@@ -7,9 +7,12 @@ DROP TABLE IF EXISTS users;
 -- Re-enable the uuid-ossp extension if it exists, otherwise create it
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
+-- gen_random_uuid() is built into PostgreSQL 13+; pgcrypto provides it on older servers
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+
 -- Table for user authentication, directly related to /api/signup and /api/login
 CREATE TABLE users (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     username TEXT UNIQUE NOT NULL,
     firstname TEXT,
     lastname TEXT,
@@ -56,7 +59,7 @@ CREATE TABLE incidents (
 
 -- Table for storing contact form submissions, related to /api/contact
 CREATE TABLE feedback (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     name TEXT NOT NULL,
     email TEXT NOT NULL,
     subject TEXT,
@@ -67,6 +70,8 @@ CREATE TABLE feedback (
 
 -- Create indexes for foreign keys and frequently queried columns
 CREATE INDEX idx_users_email ON users(email);
+CREATE UNIQUE INDEX ix_users_email_lower ON users (lower(email));
+CREATE INDEX ix_users_username_lower ON users (lower(username));
 CREATE INDEX idx_users_username ON users(username);
 CREATE INDEX idx_documents_file_path ON documents(file_path);
 CREATE INDEX idx_diagnostic_results_user_id ON diagnostic_results(user_id);